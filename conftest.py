@@ -0,0 +1,48 @@
+"""
+Configuration for the test suite.
+"""
+
+import os
+import sys
+import tempfile
+
+import joblib
+
+# RAM-backed filesystem available on most Linux systems
+RAMDISK = "/dev/shm"
+
+
+def _use_ramdisk():
+    # The tests write many short-lived cache and output files, so put them
+    # on a RAM-backed filesystem if there is one. This must happen before
+    # anything asks for the temporary directory, since tempfile caches it.
+    # In particular, it must happen before pytest-xdist sets up its workers,
+    # which is why this hook is in the top-level conftest; one inside the
+    # test package is only loaded when the tests are collected.
+    # An explicitly configured temporary directory is always respected.
+    if any(os.environ.get(var) for var in ("TMPDIR", "TEMP", "TMP")):
+        return
+    if not sys.platform.startswith("linux"):
+        return
+    if os.path.isdir(RAMDISK) and os.access(RAMDISK, os.W_OK | os.X_OK):
+        tempfile.tempdir = RAMDISK
+
+
+def _limit_worker_cores():
+    # Each pytest-xdist worker runs Experiment tests which, by default, use
+    # one job per CPU core (ncores_preparation=-1, ncores_separation=-1).
+    # Share the cores between the workers instead, so running with -n auto
+    # does not start workers-squared threads. joblib resolves n_jobs=-1
+    # with its cpu_count, which is capped by LOKY_MAX_CPU_COUNT.
+    if not os.environ.get("PYTEST_XDIST_WORKER"):
+        return
+    if os.environ.get("LOKY_MAX_CPU_COUNT"):
+        return
+    n_workers = int(os.environ.get("PYTEST_XDIST_WORKER_COUNT", 1))
+    n_cores = max(1, joblib.cpu_count() // max(1, n_workers))
+    os.environ["LOKY_MAX_CPU_COUNT"] = str(n_cores)
+
+
+def pytest_configure(config):
+    _use_ramdisk()
+    _limit_worker_cores()
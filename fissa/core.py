@@ -208,17 +208,14 @@ def extract(
         print("{}Converting ROIs to masks".format(mheader))
     base_masks = datahandler.rois2masks(rois, curdata)
 
-    # get the mean image
-    mean = datahandler.getmean(curdata)
-
     if verbosity == 3:
         print("{}Growing neuropil regions and extracting traces".format(mheader))
 
     # Initialise output variables
-    traces = []
+    roi_masks = []
     polys = []
 
-    # get neuropil masks and extract signals
+    # get neuropil masks
     for base_mask in tqdm(
         base_masks,
         total=len(base_masks),
@@ -231,12 +228,28 @@ def extract(
         )
         # add all current masks together
         masks = [base_mask] + npil_masks
-        # extract traces
-        traces.append(datahandler.extracttraces(curdata, masks))
         # store ROI outlines
         polys.append([roitools.find_roi_edge(mask) for mask in masks])
-
-    # Convert traces from a list to a single numpy array
+        # keep the masks as flat pixel indices, which are much smaller
+        # than the dense masks
+        roi_masks.append(roitools.MaskSet.from_masks(masks))
+
+    if extraction._uses_builtin(type(datahandler), "extracttraces"):
+        # Get the mean image and extract signals from every mask in one pass
+        # through the data
+        mean, traces = datahandler.extract_and_mean(
+            curdata, roitools.MaskSet.concatenate(roi_masks)
+        )
+        # Split traces up by ROI
+        splits = np.cumsum([len(masks) for masks in roi_masks])[:-1]
+        traces = np.split(traces, splits, axis=0)
+    else:
+        # Other handlers are given the masks for one ROI at a time, in the
+        # format of rois2masks, so only those dense masks are held in memory
+        mean = datahandler.getmean(curdata)
+        traces = [datahandler.extracttraces(curdata, masks[:]) for masks in roi_masks]
+
+    # Convert to a single numpy array
     traces = np.stack(traces, axis=0)
 
     if verbosity >= 2:
@@ -995,7 +1008,10 @@ class Experiment:
             return
         if self.verbosity >= 1:
             print("Loading data from cache {}".format(path))
-        cache = np.load(path, allow_pickle=True)
+        # Read each field from the archive once. Accessing an NpzFile by key
+        # decompresses (and unpickles) the member again on every access.
+        with np.load(path, allow_pickle=True) as archive:
+            cache = {field: archive[field] for field in archive.files}
 
         def _unpack_scalar(x):
             if np.array_equal(x, None):
@@ -1006,7 +1022,7 @@ class Experiment:
             return x
 
         if force:
-            for field in cache.files:
+            for field in cache:
                 if field in dynamic_properties:
                     continue
                 setattr(self, field, _unpack_scalar(cache[field]))
@@ -1052,7 +1068,7 @@ class Experiment:
                 continue
             # Check the image and roi size is appropriate
             for k in ["raw", "result"]:
-                if k not in cache.files or np.array_equal(cache[k], None):
+                if k not in cache or np.array_equal(cache[k], None):
                     continue
                 if cache[k].shape[1] != self.nTrials:
                     raise ValueError(
@@ -1070,7 +1086,7 @@ class Experiment:
             # Wipe the values currently held before setting new values
             if not skip_clear:
                 for field in clearif:
-                    if field in cache.files:
+                    if field in cache:
                         clearfn()
                         break
             # All the validators were valid, so we are okay to load the fields
@@ -1078,7 +1094,7 @@ class Experiment:
             # Check to see if there are any fields to load. If not, we won't
             # load the validators.
             any_field_to_load = False
-            for field in cache.files:
+            for field in cache:
                 if field in dynamic_properties:
                     continue
                 if field in fields:
@@ -1091,7 +1107,7 @@ class Experiment:
             # We do this before loading in the data fields because of automatic
             # clear when parameter attributes change.
             for validator in validators:
-                if validator not in cache.files:
+                if validator not in cache:
                     continue
                 value = _unpack_scalar(cache[validator])
                 if getattr(self, validator, None) is None:
@@ -1115,7 +1131,7 @@ class Experiment:
         # Check there weren't any left over fields in the cache which
         # were left unloaded
         unset_fields = []
-        for field in cache.files:
+        for field in cache:
             if field in dynamic_properties:
                 continue
             if field not in set_fields:
@@ -7,9 +7,13 @@ Authors:
 """
 
 import abc
+import os.path
+import sys
 import warnings
 
+import joblib
 import numpy as np
+import scipy.sparse
 import six
 import tifffile
 from past.builtins import basestring
@@ -17,12 +21,279 @@ from PIL import Image, ImageSequence
 
 from . import roitools
 
+try:
+    import numba
+except ImportError:
+    numba = None
+
 try:
     ABC = abc.ABC  # Python >= 3.4
 except (AttributeError, NameError):
     ABC = object
 
 
+def _extract_csr(data, indptr, indices, weights, out):
+    """
+    Average the data within each mask, with masks given in CSR format.
+
+    Compiled with :func:`numba.njit` when numba is available.
+
+    Parameters
+    ----------
+    data : numpy.ndarray shaped (frames, pixels)
+        Flattened data array.
+    indptr : numpy.ndarray shaped (n_masks + 1, )
+        The pixels of the ``i``-th mask are
+        ``indices[indptr[i] : indptr[i + 1]]``.
+    indices : numpy.ndarray
+        Flat indices of the pixels within each mask.
+    weights : numpy.ndarray
+        Weight of each pixel in `indices`.
+    out : numpy.ndarray shaped (n_masks, frames)
+        Output array, which is filled with the trace for each mask.
+    """
+    for t in range(data.shape[0]):
+        for i in range(out.shape[0]):
+            total = 0.0
+            for j in range(indptr[i], indptr[i + 1]):
+                total += data[t, indices[j]] * weights[j]
+            out[i, t] = total
+
+
+if numba is not None:
+    # Release the GIL so traces can be extracted from several trials at once
+    # with the threading backend used by fissa.Experiment.
+    try:
+        _extract_csr = numba.njit(nogil=True, fastmath=True, cache=True)(_extract_csr)
+    except RuntimeError:
+        # There is nowhere writable to cache the compiled function, for
+        # instance when installed read-only, so compile it on each import.
+        _extract_csr = numba.njit(nogil=True, fastmath=True)(_extract_csr)
+
+
+def _uses_kernel(data):
+    """
+    Check whether traces are extracted from data with the compiled kernel.
+
+    Parameters
+    ----------
+    data : numpy.ndarray
+        Data array.
+
+    Returns
+    -------
+    bool
+        Whether numba is available and supports the dtype of `data`.
+    """
+    return numba is not None and data.dtype.isnative and data.dtype != np.float16
+
+
+def _sparse_weights(masks):
+    """
+    Convert masks to a sparse weight matrix over the pixels they cover.
+
+    Parameters
+    ----------
+    masks : fissa.roitools.MaskSet
+        Masks to extract traces from.
+
+    Returns
+    -------
+    support : numpy.ndarray
+        Flat indices of the pixels which fall inside at least one mask.
+    weights : scipy.sparse.csr_matrix shaped (len(masks), len(support))
+        Weight of each pixel in `support` within each mask.
+    """
+    support, columns = np.unique(masks.indices, return_inverse=True)
+    weights = scipy.sparse.csr_matrix(
+        (masks.weights, columns, masks.indptr), shape=(len(masks), len(support))
+    )
+    return support, weights
+
+
+def _extract_flat(data, masks, sparse=None):
+    """
+    Extract the average signal within each mask from flattened data.
+
+    Parameters
+    ----------
+    data : numpy.ndarray shaped (frames, pixels)
+        Data array, with each frame flattened.
+    masks : fissa.roitools.MaskSet
+        Masks to extract traces from.
+    sparse : tuple, optional
+        The output of :func:`_sparse_weights` for `masks`, which can be
+        reused across chunks of the same recording. Computed if needed
+        and not given.
+
+    Returns
+    -------
+    traces : numpy.ndarray
+        Trace for each mask, shaped ``(len(masks), frames)``. The trace
+        for an empty mask is NaN.
+    """
+    if _uses_kernel(data):
+        # Use the compiled kernel, which reads the mask pixels in place
+        out = np.empty((len(masks), data.shape[0]), dtype=np.float64)
+        _extract_csr(data, masks.indptr, masks.indices, masks.weights, out)
+    else:
+        # Gather the pixels which fall inside at least one mask, and find the
+        # mean within every mask with one sparse matrix product over these.
+        if sparse is None:
+            sparse = _sparse_weights(masks)
+        support, weights = sparse
+        pixels = np.take(data, support, axis=1)
+        out = np.asarray(weights.dot(pixels.T), dtype=np.float64)
+    # The mean of an empty mask is undefined
+    out[masks.sizes == 0] = np.nan
+    return out
+
+
+def _frames_per_chunk(data):
+    """
+    Choose how many frames to process at once when streaming through data.
+
+    Each chunk is sized to fit in half of a conservatively estimated 8 MB L3
+    cache, alongside the float64 accumulators.
+
+    Parameters
+    ----------
+    data : numpy.ndarray shaped (frames, y, x)
+        Data array.
+
+    Returns
+    -------
+    int
+        Number of frames per chunk.
+    """
+    frame_bytes = max(1, data[:1].nbytes)
+    return max(1, (8 * 1024 * 1024) // 2 // frame_bytes)
+
+
+def _sum_frames(frames):
+    """
+    Sum a block of frames together, without loss of precision.
+
+    Frames with 8- or 16-bit integer data are summed with a 32-bit integer
+    accumulator, which is exact for up to 65536 frames and faster than
+    converting every pixel to float64. Otherwise, the sum is computed in
+    float64.
+
+    Parameters
+    ----------
+    frames : numpy.ndarray shaped (frames, y, x)
+        Block of frames.
+
+    Returns
+    -------
+    numpy.ndarray
+        The y-by-x sum across frames.
+    """
+    if (
+        frames.dtype.kind in "ui"
+        and frames.dtype.itemsize <= 2
+        and frames.shape[0] <= 65536
+    ):
+        return frames.sum(axis=0, dtype=frames.dtype.kind + "4")
+    return frames.sum(axis=0, dtype=np.float64)
+
+
+# Numpy dtypes for the raw buffers of Pillow image modes which map directly
+# onto a single-channel numpy array.
+_PILLOW_MODE_DTYPES = {
+    "L": np.dtype(np.uint8),
+    "I;16": np.dtype("<u2"),
+    "I;16L": np.dtype("<u2"),
+    "I;16B": np.dtype(">u2"),
+    "I;16S": np.dtype("<i2"),
+    "I": np.dtype(np.int32),
+    "F": np.dtype(np.float32),
+}
+
+
+def _pillow2array(frame):
+    """
+    Convert the current frame of a :class:`PIL.Image` to a numpy array.
+
+    For single-channel image modes, the raw image buffer is read directly,
+    which avoids the overhead of going through the array interface.
+
+    Parameters
+    ----------
+    frame : PIL.Image
+        Pillow image handle.
+
+    Returns
+    -------
+    numpy.ndarray
+        The frame as a y-by-x array.
+    """
+    dtype = _PILLOW_MODE_DTYPES.get(frame.mode)
+    if dtype is None:
+        return np.asarray(frame)
+    return np.frombuffer(frame.tobytes(), dtype=dtype).reshape(frame.size[::-1])
+
+
+def _pillow_mask_sums(image, frames, mask_id, flat_idx, nrois):
+    """
+    Sum the pixels within each mask, for a selection of frames.
+
+    Parameters
+    ----------
+    image : PIL.Image
+        An open :class:`PIL.Image` handle to a multi-frame TIFF image.
+    frames : iterable of int
+        Indices of the frames to use.
+    mask_id : numpy.ndarray
+        Index of the mask which each pixel in `flat_idx` belongs to.
+    flat_idx : numpy.ndarray
+        Flat indices of the pixels within each mask.
+    nrois : int
+        Number of masks.
+
+    Returns
+    -------
+    numpy.ndarray
+        Sum within each mask, shaped ``(nrois, len(frames))``.
+    """
+    out = np.zeros((nrois, len(frames)))
+    for i, f in enumerate(frames):
+        # set frame
+        image.seek(f)
+        # sum the pixels within each mask
+        out[:, i] = np.bincount(
+            mask_id,
+            weights=_pillow2array(image).ravel()[flat_idx],
+            minlength=nrois,
+        )
+    return out
+
+
+def _uses_builtin(cls, name):
+    """
+    Check whether a data handler uses one of the implementations in this module.
+
+    Parameters
+    ----------
+    cls : type
+        Data handler class.
+    name : str
+        Name of the method to check.
+
+    Returns
+    -------
+    bool
+        Whether ``cls.name`` is the method of the same name from
+        :class:`DataHandlerTifffile`, :class:`DataHandlerTifffileLazy`,
+        or :class:`DataHandlerPillow`.
+    """
+    method = getattr(cls, name)
+    return any(
+        method == getattr(handler, name)
+        for handler in (DataHandlerTifffile, DataHandlerTifffileLazy, DataHandlerPillow)
+    )
+
+
 @six.add_metaclass(abc.ABCMeta)  # Python 2.7 backward compatibility
 class DataHandlerAbstract(ABC):
     """
@@ -144,6 +415,36 @@ class DataHandlerAbstract(ABC):
         """
         raise NotImplementedError()
 
+    @classmethod
+    def extract_and_mean(cls, data, masks):
+        """
+        Determine the mean image and extract the traces within each mask.
+
+        Equivalent to calling :meth:`getmean` and :meth:`extracttraces`.
+        Data handlers may override this to do both in a single pass
+        through the data.
+
+        Parameters
+        ----------
+        data : data_type
+            The same object as returned by :meth:`image2array`.
+        masks : mask_type
+            The same object as returned by :meth:`rois2masks`.
+
+        Returns
+        -------
+        mean : numpy.ndarray
+            Mean image as a 2D, y-by-x, array.
+        traces : numpy.ndarray
+            Trace for each mask, shaped ``(len(masks), n_frames)``.
+        """
+        if isinstance(masks, roitools.MaskSet) and not _uses_builtin(
+            cls, "extracttraces"
+        ):
+            # Other handlers are given masks in the format of rois2masks
+            masks = [masks[i] for i in range(len(masks))]
+        return cls.getmean(data), cls.extracttraces(data, masks)
+
 
 class DataHandlerTifffile(DataHandlerAbstract):
     """
@@ -155,6 +456,9 @@ class DataHandlerTifffile(DataHandlerAbstract):
         """
         Load a TIFF image from disk.
 
+        Uncompressed TIFF files are memory-mapped (copy-on-write) instead of
+        being read into memory, so frames are only loaded when accessed.
+
         Parameters
         ----------
         image : str or :term:`array_like` shaped (time, height, width)
@@ -169,6 +473,27 @@ class DataHandlerTifffile(DataHandlerAbstract):
         if not isinstance(image, basestring):
             return np.asarray(image)
 
+        with tifffile.TiffFile(image) as tif:
+            # A single series of 2d pages can be memory-mapped directly, if it
+            # is stored uncompressed and contiguously. Only files in native
+            # byte order are mapped, so the data always has a native dtype.
+            series_shape = tif.series[0].shape
+            use_memmap = (
+                len(tif.series) == 1
+                and len(tif.pages[0].shape) == 2
+                and np.prod(series_shape[:-2]) == len(tif.pages)
+                and tif.byteorder == ("<" if sys.byteorder == "little" else ">")
+            )
+        if use_memmap:
+            try:
+                data = tifffile.memmap(image, mode="c")
+            except ValueError:
+                # The image data is compressed or not contiguous
+                pass
+            else:
+                # Return as a regular numpy.ndarray, backed by the memory-map
+                return np.asarray(data).reshape((-1,) + tuple(data.shape[-2:]))
+
         with tifffile.TiffFile(image) as tif:
             frames = []
             n_pages = len(tif.pages)
@@ -221,7 +546,13 @@ class DataHandlerTifffile(DataHandlerAbstract):
         numpy.ndarray
             y by x array for the mean values
         """
-        return data.mean(axis=0, dtype=np.float64)
+        # Accumulate the sum over chunks of frames, so memory-mapped data is
+        # streamed through memory instead of all being paged in at once.
+        chunk_size = _frames_per_chunk(data)
+        total = np.zeros(data.shape[1:], dtype=np.float64)
+        for start in range(0, data.shape[0], chunk_size):
+            total += _sum_frames(data[start : start + chunk_size])
+        return total / data.shape[0]
 
     @staticmethod
     def get_frame_size(data):
@@ -249,27 +580,66 @@ class DataHandlerTifffile(DataHandlerAbstract):
         ----------
         data : :term:`array_like`
             Data array as made by :meth:`image2array`, shaped ``(frames, y, x)``.
-        masks : :class:`list` of :term:`array_like`
-            List of binary arrays.
+        masks : :class:`list` of :term:`array_like` or fissa.roitools.MaskSet
+            List of binary arrays, or the same masks as a
+            :class:`~fissa.roitools.MaskSet`.
 
         Returns
         -------
         traces : numpy.ndarray
             Trace for each mask, shaped ``(len(masks), n_frames)``.
         """
-        # get the number rois and frames
-        nrois = len(masks)
-        nframes = data.shape[0]
+        # Convert the masks to flat pixel indices, and find the mean within
+        # every mask using only the pixels inside the masks.
+        masks = roitools.MaskSet.from_masks(masks)
+        data = np.asarray(data)
+        return _extract_flat(data.reshape(data.shape[0], -1), masks)
 
-        # predefine output data
-        out = np.zeros((nrois, nframes))
+    @classmethod
+    def extract_and_mean(cls, data, masks):
+        """
+        Determine the mean image and extract the traces within each mask.
 
-        # loop over masks
-        for i in range(nrois):  # for masks
-            # get mean data from mask
-            out[i, :] = data[:, masks[i]].mean(axis=1, dtype=np.float64)
+        Both are computed in a single pass through the data, so each frame
+        is only read from memory (or disk, if memory-mapped) once. If a
+        subclass overrides :meth:`getmean` or :meth:`extracttraces`, those
+        are called instead.
 
-        return out
+        Parameters
+        ----------
+        data : :term:`array_like`
+            Data array as made by :meth:`image2array`, shaped ``(frames, y, x)``.
+        masks : :class:`list` of :term:`array_like` or fissa.roitools.MaskSet
+            List of binary arrays, or the same masks as a
+            :class:`~fissa.roitools.MaskSet`.
+
+        Returns
+        -------
+        mean : numpy.ndarray
+            y by x array for the mean values.
+        traces : numpy.ndarray
+            Trace for each mask, shaped ``(len(masks), n_frames)``.
+        """
+        if not (
+            cls.getmean == DataHandlerTifffile.getmean
+            and cls.extracttraces == DataHandlerTifffile.extracttraces
+        ):
+            return super(DataHandlerTifffile, cls).extract_and_mean(data, masks)
+        masks = roitools.MaskSet.from_masks(masks)
+        data = np.asarray(data)
+        n_frames = data.shape[0]
+        chunk_size = _frames_per_chunk(data)
+        total = np.zeros(data.shape[1:], dtype=np.float64)
+        traces = np.empty((len(masks), n_frames), dtype=np.float64)
+        # Build the sparse weights once, rather than for every chunk
+        sparse = None if _uses_kernel(data) else _sparse_weights(masks)
+        for start in range(0, n_frames, chunk_size):
+            chunk = data[start : start + chunk_size]
+            total += _sum_frames(chunk)
+            traces[:, start : start + chunk_size] = _extract_flat(
+                chunk.reshape(chunk.shape[0], -1), masks, sparse
+            )
+        return total / n_frames, traces
 
 
 class DataHandlerTifffileLazy(DataHandlerAbstract):
@@ -374,36 +744,32 @@ class DataHandlerTifffileLazy(DataHandlerAbstract):
         ----------
         data : tifffile.TiffFile
             Open tifffile.TiffFile object.
-        masks : list of array_like
-            List of binary arrays.
+        masks : list of array_like or fissa.roitools.MaskSet
+            List of binary arrays, or the same masks as a
+            :class:`~fissa.roitools.MaskSet`.
 
         Returns
         -------
         traces : numpy.ndarray
             Trace for each mask, shaped ``(len(masks), n_frames)``.
         """
-        # Get the number rois
-        nrois = len(masks)
+        # Convert the masks to flat pixel indices
+        masks = roitools.MaskSet.from_masks(masks)
 
         # Initialise output as a list, because we don't know how many frames
         # there will be
         out = []
+        # Sparse weights for the masks, built once if they are needed
+        sparse = None
 
         # For each frame, get the data
         for page in data.pages:
             page = page.asarray()
-            shp = [-1] + list(page.shape[-2:])
-            page = page.reshape(shp)
-
-            page_traces = np.zeros((nrois, page.shape[0]), dtype=np.float64)
-            for i in range(nrois):
-                # Get mean data from mask
-                page_traces[i, :] = np.mean(
-                    page[..., masks[i]],
-                    dtype=np.float64,
-                    axis=-1,
-                )
-            out.append(page_traces)
+            page = page.reshape(-1, page.shape[-2] * page.shape[-1])
+            if sparse is None and not _uses_kernel(page):
+                sparse = _sparse_weights(masks)
+            # Get mean data from each mask
+            out.append(_extract_flat(page, masks, sparse))
 
         out = np.concatenate(out, axis=-1)
         return out
@@ -461,7 +827,7 @@ class DataHandlerPillow(DataHandlerAbstract):
 
         # Loop over all frames and sum the pixel intensities together
         for frame in ImageSequence.Iterator(data):
-            avg += np.asarray(frame)
+            avg += _pillow2array(frame)
 
         # Divide by number of frames to find the average
         avg /= data.n_frames
@@ -485,7 +851,7 @@ class DataHandlerPillow(DataHandlerAbstract):
         return data.size[::-1]
 
     @staticmethod
-    def extracttraces(data, masks):
+    def extracttraces(data, masks, n_jobs=1):
         """
         Extract the average signal within each mask across the data.
 
@@ -493,35 +859,59 @@ class DataHandlerPillow(DataHandlerAbstract):
         ----------
         data : PIL.Image
             An open :class:`PIL.Image` handle to a multi-frame TIFF image.
-        masks : list of :term:`array_like`
-            List of binary arrays.
+        masks : list of :term:`array_like` or fissa.roitools.MaskSet
+            List of binary arrays, or the same masks as a
+            :class:`~fissa.roitools.MaskSet`.
+        n_jobs : int, default=1
+            Number of threads to decode frames with, each of which opens its
+            own handle to the image file. Set to ``-1`` to use all the CPU
+            cores. Only used if `data` was opened from a file path.
+            Default is ``1``, since :class:`fissa.Experiment` already
+            processes several trials at once.
 
         Returns
         -------
         traces : numpy.ndarray
             Trace for each mask, shaped ``(len(masks), n_frames)``.
         """
-        # get the number rois
+        # Convert the masks to flat pixel indices, and label each pixel by
+        # the mask it belongs to. This lets us find the sum within every
+        # mask with one call to np.bincount per frame.
+        masks = roitools.MaskSet.from_masks(masks)
         nrois = len(masks)
+        sizes = masks.sizes
+        mask_id = np.repeat(np.arange(nrois), sizes)
+        flat_idx = masks.indices
 
-        # get number of frames, and start at zeros
-        data.seek(0)
+        # get number of frames
         nframes = data.n_frames
 
-        # predefine array with the data
-        out = np.zeros((nrois, nframes))
-
-        # for each frame, get the data
-        for f in range(nframes):
-            # set frame
-            data.seek(f)
-
-            # make numpy array
-            curframe = np.asarray(data)
-
-            # loop over masks
-            for i in range(nrois):
-                # get mean data from mask
-                out[i, f] = np.mean(curframe[masks[i]], dtype=np.float64)
-
+        # Decoding frames releases the GIL, so if we know where the image
+        # came from we can split the frames between several threads. Each
+        # thread needs its own image handle, since seeking is stateful.
+        filename = getattr(data, "filename", None)
+        if filename and os.path.isfile(filename):
+            n_jobs = min(joblib.effective_n_jobs(n_jobs), nframes)
+        else:
+            n_jobs = 1
+
+        if n_jobs <= 1:
+            out = _pillow_mask_sums(data, range(nframes), mask_id, flat_idx, nrois)
+        else:
+
+            def _worker(frames):
+                with Image.open(filename) as image:
+                    return _pillow_mask_sums(image, frames, mask_id, flat_idx, nrois)
+
+            out = joblib.Parallel(n_jobs=n_jobs, backend="threading")(
+                joblib.delayed(_worker)(frames)
+                for frames in np.array_split(np.arange(nframes), n_jobs)
+            )
+            out = np.concatenate(out, axis=1)
+
+        # divide by the size of each mask to get the mean, which is
+        # undefined for an empty mask
+        empty = sizes == 0
+        out[~empty] /= sizes[~empty, None]
+        out[empty] = np.nan
         return out
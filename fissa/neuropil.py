@@ -50,6 +50,13 @@ def validate_nmf_parameters(function, *args, **kwargs):
     return decorator
 
 
+# FastICA's whiten=True was renamed to "arbitrary-variance" in scikit-learn 1.1
+if tuple(int(v) for v in SKLEARN_VERSION.split(".")[:2]) >= (1, 1):
+    _FASTICA_WHITEN = "arbitrary-variance"
+else:
+    _FASTICA_WHITEN = True
+
+
 def separate(
     S,
     sep_method="nmf",
@@ -184,28 +191,60 @@ def separate(
     median = np.median(S)
     S /= median
 
+    # The estimators work on observations-by-signals data. Make this layout
+    # contiguous once, instead of sklearn copying the transposed view on
+    # every attempt.
+    X = np.ascontiguousarray(S.T, dtype=np.float64)
+
+    # Whitened data and the matrix mapping it back to the observations,
+    # if the data is whitened before separation. This is only done when the
+    # number of components is estimated with PCA for ICA, in which case the
+    # PCA fit is reused.
+    S_white = None
+    unwhiten = None
+
     # estimate number of signals to find, if not given
     if n is None:
         if sep_method.lower() == "ica":
             # Perform PCA
             pca = sklearn.decomposition.PCA(whiten=False)
-            pca.fit(S.T)
+            pca.fit(X)
 
             # find number of components with at least x percent explained var
             n = sum(pca.explained_variance_ratio_ > 0.01)
+
+            # Reuse the PCA to whiten the data for ICA, instead of having
+            # FastICA decompose the data all over again
+            scale = np.sqrt(pca.explained_variance_[:n])
+            S_white = pca.transform(X)[:, :n] / scale
+            unwhiten = pca.components_[:n].T * scale
         else:
             n = S.shape[0]
 
     for i_try in range(max_tries):
 
-        if sep_method.lower() in {"ica", "fastica"}:
-            # Use sklearn's implementation of ICA.
+        if sep_method.lower() in {"ica", "fastica"} and S_white is not None:
+            # Use sklearn's implementation of ICA on the data we already
+            # whitened. Only the random initialisation of the unmixing
+            # matrix changes between attempts.
+            estimator = sklearn.decomposition.FastICA(
+                whiten=False,
+                max_iter=max_iter,
+                tol=tol,
+                random_state=random_state,
+            )
 
-            # Make an instance of the FastICA class. We can do whitening of
-            # the data now.
+            # Perform ICA and find separated signals
+            S_sep = estimator.fit_transform(S_white)
+
+        elif sep_method.lower() in {"ica", "fastica"}:
+            # Use sklearn's implementation of ICA, which whitens the data
+            # itself. This is given the transposed view of S, not X, since
+            # FastICA's convergence with all the components kept depends on
+            # the memory layout of its input.
             estimator = sklearn.decomposition.FastICA(
                 n_components=n,
-                whiten=True,
+                whiten=_FASTICA_WHITEN,
                 max_iter=max_iter,
                 tol=tol,
                 random_state=random_state,
@@ -228,7 +267,7 @@ def separate(
                 random_state=random_state,
             )
             # Perform NMF and find separated signals
-            S_sep = estimator.fit_transform(S.T, W=W0, H=H0)
+            S_sep = estimator.fit_transform(X, W=W0, H=H0)
         elif sep_method.lower() in {"batch", "minibatch", "minibatchnmf"}:
             # Make an instance of the sklearn NMF class
             estimator = validate_nmf_parameters(sklearn.decomposition.MiniBatchNMF)(
@@ -243,7 +282,7 @@ def separate(
                 random_state=random_state,
             )
             # Perform NMF and find separated signals
-            S_sep = estimator.fit_transform(S.T, W=W0, H=H0)
+            S_sep = estimator.fit_transform(X, W=W0, H=H0)
         elif hasattr(sklearn.decomposition, sep_method):
             if verbosity >= 1:
                 print(
@@ -259,7 +298,7 @@ def separate(
                 max_iter=max_iter,
                 random_state=random_state,
             )
-            S_sep = estimator.fit_transform(S.T)
+            S_sep = estimator.fit_transform(X)
 
         else:
             raise ValueError('Unknown separation method "{}".'.format(sep_method))
@@ -299,6 +338,10 @@ def separate(
         A_sep = estimator.mixing_
     else:
         A_sep = estimator.components_.T
+    if unwhiten is not None:
+        # Map the mixing matrix from the whitened space back to the
+        # observed signals
+        A_sep = np.dot(unwhiten, A_sep)
 
     # Normalize the columns in A so that sum(column)=1 (can be done in one line
     # too).
@@ -309,10 +352,9 @@ def separate(
     # separated (output) signal, we find how much weighting each input (raw)
     # signal contributes to that separated signal, relative to the other input
     # signals.
-    A = abs(np.copy(A_sep))
-    for j in range(n):
-        if np.sum(A[:, j]) != 0:
-            A[:, j] /= np.sum(A[:, j])
+    A = np.abs(A_sep)
+    sums = A.sum(axis=0)
+    A /= np.where(sums == 0, 1, sums)
 
     # get the scores for the somatic signal
     scores = A[0, :]
@@ -324,9 +366,7 @@ def separate(
 
     # Order the signals according to their scores, and scale the magnitude
     # back to the original magnitude.
-    S_matched = np.zeros_like(S_sep)
-    for j in range(n):
-        S_matched[:, j] = A_sep[0, order[j]] * S_sep[:, order[j]]
+    S_matched = S_sep[:, order] * A_sep[0, order]
 
     # save the algorithm convergence info
     convergence = {}
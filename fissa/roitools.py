@@ -473,11 +473,136 @@ def rois2masks(rois, shape):
             " a {}".format(rois.__class__)
         )
 
+    # Determine the shape of the first ROI. Only coerce it to an array if it
+    # isn't one already, since masks can be large.
+    if hasattr(rois[0], "shape"):
+        roi_shape = rois[0].shape
+    else:
+        roi_shape = np.shape(rois[0])
+
     # If it's a something by 2 array (or vice versa), assume polygons
-    if np.shape(rois[0])[1] == 2 or np.shape(rois[0])[0] == 2:
+    if roi_shape[1] == 2 or roi_shape[0] == 2:
         return getmasks(rois, shape)
     # If it's a list of bigger arrays, assume masks
-    elif np.shape(rois[0]) == shape:
+    elif roi_shape == shape:
         return rois
 
     raise ValueError("Wrong ROIs input format: unfamiliar shape.")
+
+
+class MaskSet(object):
+    """
+    Collection of binary masks, stored as flat arrays of pixel indices.
+
+    The masks are held in a compressed sparse row (CSR) layout: the pixels
+    of the ``i``-th mask are ``indices[indptr[i] : indptr[i + 1]]``, given
+    as flat indices into a frame shaped `shape`. Each pixel also carries a
+    weight of ``1 / size``, where ``size`` is the number of pixels in its
+    mask, so that weighted sums over each mask give the mean within it.
+
+    Indexing a :class:`MaskSet` returns the corresponding dense boolean
+    mask (or a list of them, for a slice), so it can be used in place of a
+    list of masks. For typical ROIs,
+    which cover a small fraction of the frame, this takes much less memory
+    than storing each mask as a dense boolean array.
+
+    Parameters
+    ----------
+    indptr : :term:`array_like` shaped (n_masks + 1, )
+        Offsets into `indices` at which each mask starts and ends.
+    indices : :term:`array_like`
+        Flat indices of the pixels within each mask.
+    shape : tuple of ints
+        The 2D, y-by-x, shape of each mask.
+
+    Attributes
+    ----------
+    indptr : numpy.ndarray
+        Offsets into `indices` at which each mask starts and ends.
+    indices : numpy.ndarray
+        Flat indices of the pixels within each mask, as int32.
+    weights : numpy.ndarray
+        Weight of each pixel in `indices`, being one over the size of
+        the mask it belongs to.
+    shape : tuple of ints
+        The 2D, y-by-x, shape of each mask.
+    """
+
+    def __init__(self, indptr, indices, shape):
+        self.indptr = np.asarray(indptr, dtype=np.int64)
+        self.indices = np.asarray(indices, dtype=np.int32)
+        self.shape = tuple(shape)
+        sizes = self.sizes
+        self.weights = np.repeat(1.0 / np.maximum(sizes, 1), sizes)
+
+    @classmethod
+    def from_masks(cls, masks, shape=None):
+        """
+        Convert a list of binary masks into a :class:`MaskSet`.
+
+        Parameters
+        ----------
+        masks : :term:`list` of :term:`array_like` or MaskSet
+            List of binary arrays. If this is already a :class:`MaskSet`,
+            it is returned unchanged.
+        shape : tuple of ints, optional
+            The 2D shape of each mask. Only needed if `masks` is empty,
+            otherwise it is taken from the first mask.
+
+        Returns
+        -------
+        MaskSet
+            The masks in flat index form.
+        """
+        if isinstance(masks, cls):
+            return masks
+        indices = [np.flatnonzero(mask) for mask in masks]
+        if shape is None:
+            shape = np.shape(masks[0]) if len(masks) else (0, 0)
+        indptr = np.cumsum([0] + [len(idx) for idx in indices])
+        if indices:
+            indices = np.concatenate(indices)
+        return cls(indptr, indices, shape)
+
+    @classmethod
+    def concatenate(cls, masksets):
+        """
+        Join several :class:`MaskSet` objects into one.
+
+        Parameters
+        ----------
+        masksets : :term:`list` of MaskSet
+            Mask sets to join, which must all have the same shape.
+
+        Returns
+        -------
+        MaskSet
+            All the masks from each of `masksets`, in order.
+        """
+        if not masksets:
+            return cls([0], [], (0, 0))
+        offsets = np.cumsum([0] + [len(m.indices) for m in masksets[:-1]])
+        indptr = np.concatenate(
+            [[0]] + [m.indptr[1:] + offset for m, offset in zip(masksets, offsets)]
+        )
+        indices = np.concatenate([m.indices for m in masksets])
+        return cls(indptr, indices, masksets[0].shape)
+
+    @property
+    def sizes(self):
+        """Number of pixels within each mask."""
+        return np.diff(self.indptr)
+
+    def __len__(self):
+        return len(self.indptr) - 1
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError("MaskSet index out of range")
+        mask = np.zeros(self.shape, dtype=bool)
+        mask.flat[self.indices[self.indptr[i] : self.indptr[i + 1]]] = True
+        return mask
@@ -5,13 +5,8 @@ Includes the numpy testing functions as methods.
 """
 
 import contextlib
-import datetime
 import os.path
-import random
-import shutil
-import string
 import sys
-import tempfile
 import unittest
 import warnings
 from inspect import getsourcefile
@@ -30,6 +25,25 @@ from numpy.testing import (
 TEST_DIRECTORY = os.path.dirname(os.path.abspath(getsourcefile(lambda: 0)))
 
 
+def _as_dense(x):
+    """
+    Stack a nested sequence of numeric arrays into a single array.
+
+    Returns ``None`` unless every leaf is a numeric :class:`numpy.ndarray`
+    and all the leaves have the same shape.
+    """
+    if isinstance(x, np.ndarray) and x.dtype.kind in "biuf":
+        return x
+    if not (isinstance(x, (list, tuple)) or getattr(x, "dtype", None) == object):
+        return None
+    leaves = [_as_dense(x_i) for x_i in x]
+    if len(leaves) == 0 or any(leaf is None for leaf in leaves):
+        return None
+    if any(leaf.shape != leaves[0].shape for leaf in leaves[1:]):
+        return None
+    return np.stack(leaves)
+
+
 def assert_allclose_ragged(actual, desired):
     with warnings.catch_warnings():
         warnings.filterwarnings(
@@ -40,13 +54,22 @@ def assert_allclose_ragged(actual, desired):
             np.array(actual, dtype=object).shape,
             np.array(desired, dtype=object).shape,
         )
+        # If neither is actually ragged, compare everything in one go
+        actual_dense = _as_dense(actual)
+        desired_dense = _as_dense(desired)
+        if actual_dense is not None and desired_dense is not None:
+            if not np.array_equal(actual_dense, desired_dense):
+                assert_allclose(actual_dense, desired_dense)
+            return
         for desired_i, actual_i in zip(desired, actual):
             if (
                 getattr(desired, "dtype", None) == object
                 or np.asarray(desired).dtype == object
             ):
                 assert_allclose_ragged(actual_i, desired_i)
-            else:
+            elif not np.array_equal(actual_i, desired_i):
+                # Identical arrays are the common case, and are much quicker
+                # to check for than to compare with a tolerance
                 assert_allclose(actual_i, desired_i)
 
 
@@ -120,28 +143,6 @@ class BaseTestCase(unittest.TestCase):
         # Add a test to automatically use when comparing objects of
         # type numpy ndarray. This will be used for self.assertEqual().
         self.addTypeEqualityFunc(np.ndarray, self.assert_allclose)
-        self.tempdir = os.path.join(
-            tempfile.gettempdir(),
-            "out-" + self.generate_temp_name(),
-        )
-
-    def generate_temp_name(self, n_character=12):
-        """
-        Generate a random string to use as a temporary output path.
-        """
-        population = string.ascii_uppercase + string.digits
-        if hasattr(random, "choices"):
-            # Python 3.6+
-            rstr = "".join(random.choices(population, k=n_character))
-        else:
-            # Python 2.7/3.5
-            rstr = "".join(random.choice(population) for _ in range(n_character))
-        return "{}-{}".format(datetime.datetime.now().strftime("%M%S%f"), rstr)
-
-    def tearDown(self):
-        # If it was created, delete the randomly generated temporary directory
-        if os.path.isdir(self.tempdir):
-            shutil.rmtree(self.tempdir)
 
     @contextlib.contextmanager
     def subTest(self, *args, **kwargs):
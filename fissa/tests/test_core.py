@@ -6,16 +6,62 @@ import datetime
 import os
 import shutil
 import sys
+import tempfile
 import types
 import unittest
 import warnings
 
 import numpy as np
+import pytest
 from scipy.io import loadmat
 
 from .. import core, extraction
 from .base_test import BaseTestCase
 
+# Caches generated by separating each set of test data, shared between tests
+# which only need a cache to load from. Keyed by the test resources folder.
+_SHARED_CACHES = {}
+
+
+def teardown_module():
+    """Remove the shared caches once all the tests have run."""
+    for folder in _SHARED_CACHES.values():
+        shutil.rmtree(folder, ignore_errors=True)
+    _SHARED_CACHES.clear()
+
+
+# Images for each set of test data, loaded as arrays. Keyed by the images folder.
+_LOADED_IMAGES = {}
+
+# Expected outputs for each set of test data, keyed by the resources folder
+_EXPECTED = {}
+
+
+def load_expected(resources_dir):
+    """
+    Load the expected outputs for a set of test data.
+
+    The outputs are read from disk once, and the same dictionary is returned
+    on subsequent calls. It must not be modified.
+
+    Parameters
+    ----------
+    resources_dir : str
+        Path to the folder containing the test data.
+
+    Returns
+    -------
+    dict
+        Contents of the ``expected_py{major}.npz`` file in `resources_dir`.
+    """
+    if resources_dir not in _EXPECTED:
+        fname = os.path.join(
+            resources_dir, "expected_py{}.npz".format(sys.version_info.major)
+        )
+        with np.load(fname, allow_pickle=True) as cache:
+            _EXPECTED[resources_dir] = {k: cache[k] for k in cache.files}
+    return _EXPECTED[resources_dir]
+
 
 def merge_dicts(x, *args):
     """Merge multiple dictionaries together."""
@@ -28,15 +74,20 @@ def merge_dicts(x, *args):
 class ExperimentTestMixin:
     """Base tests for Experiment class."""
 
-    def __init__(self, *args, **kwargs):
-        self.output_dir = self.tempdir
+    @pytest.fixture(autouse=True)
+    def output_dir(self, tmp_path):
+        # Each test gets a fresh output folder, which does not exist yet
+        self.output_dir = str(tmp_path / "output")
 
-    def setUp(self):
-        self.tearDown()
+    @property
+    def expected(self):
+        """
+        Expected outputs for the test data, loaded on first use.
 
-    def tearDown(self):
-        if os.path.isdir(self.output_dir):
-            shutil.rmtree(self.output_dir)
+        Tests which do not compare against the expected outputs never
+        read them from disk.
+        """
+        return load_expected(self.resources_dir)
 
     def compare_result(self, actual):
         """
@@ -107,10 +158,11 @@ class ExperimentTestMixin:
         # Check sizes are correct
         expected_shape = len(self.roi_paths), len(self.image_names)
         if prepared:
-            self.assert_equal(np.shape(actual.raw), expected_shape)
-            self.assert_equal(len(actual.means), len(self.image_names))
-            self.assert_equal(actual.nCell, len(actual.raw))
-            self.assert_equal(actual.nTrials, len(actual.raw[0]))
+            # Compare all the structural attributes in a single assertion
+            self.assert_equal(
+                (np.shape(actual.raw), len(actual.means), actual.nCell, actual.nTrials),
+                (expected_shape, len(self.image_names)) + expected_shape,
+            )
             # Check contents are correct
             self.assert_allclose_ragged(actual.raw, self.expected["raw"])
             self.assert_equal(actual.means, self.expected["means"])
@@ -399,6 +451,121 @@ class ExperimentTestMixin:
             print("Testing presence of ~ {} ~".format(expected))
             self.assertTrue(expected in actual)
 
+    def load_images(self):
+        """
+        Load the test images as arrays.
+
+        The images are loaded with :class:`fissa.extraction.DataHandlerTifffile`
+        the first time they are needed, and then shared between tests. They
+        must not be modified.
+
+        Returns
+        -------
+        list of numpy.ndarray
+            The image data for each trial.
+        """
+        if self.images_dir not in _LOADED_IMAGES:
+            datahandler = extraction.DataHandlerTifffile()
+            _LOADED_IMAGES[self.images_dir] = [
+                datahandler.image2array(os.path.join(self.images_dir, img))
+                for img in self.image_names
+            ]
+        return _LOADED_IMAGES[self.images_dir]
+
+    def copy_cache(self, destination=None, separated=True):
+        """
+        Copy a cache of the separated test data into a folder.
+
+        The cache is generated by running :meth:`fissa.core.Experiment.separate`
+        the first time it is needed, and then shared between tests.
+
+        Parameters
+        ----------
+        destination : str, optional
+            Folder to copy the cache into, which must not yet exist.
+            Default is ``self.output_dir``.
+        separated : bool, default=True
+            Whether to include the separation results. If ``False``, only
+            the preparation results are copied.
+        """
+        if destination is None:
+            destination = self.output_dir
+        if self.resources_dir not in _SHARED_CACHES:
+            folder = tempfile.mkdtemp(prefix="fissa-cache-")
+            exp = core.Experiment(
+                self.images_dir, self.roi_zip_path, folder, verbosity=0
+            )
+            exp.separate()
+            _SHARED_CACHES[self.resources_dir] = folder
+        shutil.copytree(_SHARED_CACHES[self.resources_dir], destination)
+        if not separated:
+            os.remove(os.path.join(destination, "separated.npz"))
+
+    def load_separated(self, **kwargs):
+        """
+        Make an Experiment which loads its separation results from a cache.
+
+        The shared cache is copied into ``self.output_dir`` and loaded, so
+        the returned experiment has been separated without running the
+        separation again.
+
+        Parameters
+        ----------
+        **kwargs
+            Additional arguments as per :class:`fissa.core.Experiment`.
+
+        Returns
+        -------
+        exp : fissa.core.Experiment
+            The experiment, with preparation and separation results set.
+        """
+        self.copy_cache()
+        return core.Experiment(
+            self.images_dir, self.roi_zip_path, self.output_dir, **kwargs
+        )
+
+    def write_bad_cache(self, fname):
+        """
+        Write a corrupted cache file into ``self.output_dir``.
+
+        Parameters
+        ----------
+        fname : str
+            Name of the cache file, such as ``"prepared.npz"``.
+        """
+        if not os.path.exists(self.output_dir):
+            os.makedirs(self.output_dir)
+        with open(os.path.join(self.output_dir, fname), "w") as f:
+            f.write("badfilecontents")
+
+    def check_experiment(self, images=None, prep_only=False, **kwargs):
+        """
+        Run an Experiment on the test data and check its outputs.
+
+        Parameters
+        ----------
+        images : str or list, optional
+            Images to use. Default is ``self.images_dir``.
+        prep_only : bool, default=False
+            Whether to only run ``separation_prep``, instead of ``separate``.
+        **kwargs
+            Additional arguments as per :class:`fissa.core.Experiment`.
+
+        Returns
+        -------
+        exp : fissa.core.Experiment
+            The experiment, after running.
+        """
+        if images is None:
+            images = self.images_dir
+        exp = core.Experiment(images, self.roi_zip_path, **kwargs)
+        if prep_only:
+            exp.separation_prep()
+        else:
+            exp.separate()
+        self.compare_output(exp, separated=not prep_only)
+        return exp
+
     def test_repr_class(self):
         exp = core.Experiment(self.images_dir, self.roi_zip_path)
         self.compare_str_repr_contents(repr(exp))
@@ -469,27 +636,19 @@ class ExperimentTestMixin:
         self.assert_equal(exp.nTrials, len(self.image_names))
 
     def test_imagedir_roizip(self):
-        exp = core.Experiment(self.images_dir, self.roi_zip_path)
-        exp.separate()
-        self.compare_output(exp)
+        exp = self.check_experiment()
         self.compare_str_repr_contents(str(exp))
         self.compare_str_repr_contents(repr(exp))
 
     def test_imagelist_roizip(self):
         image_paths = [os.path.join(self.images_dir, img) for img in self.image_names]
-        exp = core.Experiment(image_paths, self.roi_zip_path)
-        exp.separate()
-        self.compare_output(exp)
+        exp = self.check_experiment(image_paths)
         self.compare_str_repr_contents(str(exp))
         self.compare_str_repr_contents(repr(exp))
 
     def test_imagelistloaded_roizip(self):
-        image_paths = [os.path.join(self.images_dir, img) for img in self.image_names]
-        datahandler = extraction.DataHandlerTifffile()
-        images = [datahandler.image2array(pth) for pth in image_paths]
-        exp = core.Experiment(images, self.roi_zip_path)
-        exp.separate()
-        self.compare_output(exp)
+        images = self.load_images()
+        exp = self.check_experiment(images)
         self.compare_str_repr_contents(str(exp))
         self.compare_str_repr_contents(repr(exp))
 
@@ -609,9 +768,7 @@ class ExperimentTestMixin:
 
     def test_verbosity_3_imagesloaded(self):
         # Load images as np.ndarrays
-        image_paths = [os.path.join(self.images_dir, img) for img in self.image_names]
-        datahandler = extraction.DataHandlerTifffile()
-        images = [datahandler.image2array(pth) for pth in image_paths]
+        images = self.load_images()
         # Run FISSA on pre-loaded images
         capture_pre = self.capsys.readouterr()  # Clear stdout
         exp = core.Experiment(
@@ -629,9 +786,7 @@ class ExperimentTestMixin:
 
     def test_verbosity_4_imagesloaded(self):
         # Load images as np.ndarrays
-        image_paths = [os.path.join(self.images_dir, img) for img in self.image_names]
-        datahandler = extraction.DataHandlerTifffile()
-        images = [datahandler.image2array(pth) for pth in image_paths]
+        images = self.load_images()
         # Run FISSA on pre-loaded images
         capture_pre = self.capsys.readouterr()  # Clear stdout
         exp = core.Experiment(
@@ -661,67 +816,25 @@ class ExperimentTestMixin:
             self.assertTrue("did not converge" in capture_post.out)
 
     def test_ncores_preparation_None(self):
-        exp = core.Experiment(
-            self.images_dir,
-            self.roi_zip_path,
-            ncores_preparation=None,
-        )
-        exp.separation_prep()
-        self.compare_output(exp, separated=False)
+        self.check_experiment(prep_only=True, ncores_preparation=None)
 
     def test_ncores_preparation_1(self):
-        exp = core.Experiment(
-            self.images_dir,
-            self.roi_zip_path,
-            ncores_preparation=1,
-        )
-        exp.separation_prep()
-        self.compare_output(exp, separated=False)
+        self.check_experiment(prep_only=True, ncores_preparation=1)
 
     def test_ncores_preparation_minus2(self):
-        exp = core.Experiment(
-            self.images_dir,
-            self.roi_zip_path,
-            ncores_preparation=-2,
-        )
-        exp.separation_prep()
-        self.compare_output(exp, separated=False)
+        self.check_experiment(prep_only=True, ncores_preparation=-2)
 
     def test_ncores_separate_None(self):
-        exp = core.Experiment(
-            self.images_dir,
-            self.roi_zip_path,
-            ncores_separation=None,
-        )
-        exp.separate()
-        self.compare_output(exp)
+        self.check_experiment(ncores_separation=None)
 
     def test_ncores_separate_1(self):
-        exp = core.Experiment(
-            self.images_dir,
-            self.roi_zip_path,
-            ncores_separation=1,
-        )
-        exp.separate()
-        self.compare_output(exp)
+        self.check_experiment(ncores_separation=1)
 
     def test_ncores_separate_minus2(self):
-        exp = core.Experiment(
-            self.images_dir,
-            self.roi_zip_path,
-            ncores_separation=-2,
-        )
-        exp.separate()
-        self.compare_output(exp)
+        self.check_experiment(ncores_separation=-2)
 
     def test_lowmemorymode(self):
-        exp = core.Experiment(
-            self.images_dir,
-            self.roi_zip_path,
-            lowmemory_mode=True,
-        )
-        exp.separate()
-        self.compare_output(exp)
+        self.check_experiment(lowmemory_mode=True)
 
     def test_lowmemorymode_datahandler(self):
         with self.assertRaises(ValueError):
@@ -733,18 +846,11 @@ class ExperimentTestMixin:
             )
 
     def test_manualhandler_Pillow(self):
-        exp = core.Experiment(
-            self.images_dir,
-            self.roi_zip_path,
-            datahandler=extraction.DataHandlerPillow(),
-        )
-        exp.separate()
-        self.compare_output(exp)
+        self.check_experiment(datahandler=extraction.DataHandlerPillow())
 
     def test_caching_missing_folder(self):
         """Test caching when the output folder does not yet exist."""
-        if os.path.isdir(self.output_dir):
-            shutil.rmtree(self.output_dir)
+        self.assertFalse(os.path.isdir(self.output_dir))
         exp = core.Experiment(self.images_dir, self.roi_zip_path, self.output_dir)
         exp.separate()
         self.assertTrue(os.path.isfile(os.path.join(self.output_dir, "prepared.npz")))
@@ -799,7 +905,7 @@ class ExperimentTestMixin:
         """Check we can write to a folder that is deleted in the middle."""
         exp = core.Experiment(self.images_dir, self.roi_zip_path, self.output_dir)
         # Delete the folder between instantiating Experiment and separate()
-        self.tearDown()
+        shutil.rmtree(self.output_dir)
         exp.separate()
         self.assertTrue(os.path.isfile(os.path.join(self.output_dir, "prepared.npz")))
         self.assertTrue(os.path.isfile(os.path.join(self.output_dir, "separated.npz")))
@@ -810,7 +916,7 @@ class ExperimentTestMixin:
         # Delete the folder between separation_prep() and separate()
         exp.separation_prep()
         self.assertTrue(os.path.isfile(os.path.join(self.output_dir, "prepared.npz")))
-        self.tearDown()
+        shutil.rmtree(self.output_dir)
         exp.separate()
         self.assertTrue(os.path.isfile(os.path.join(self.output_dir, "separated.npz")))
 
@@ -829,12 +935,13 @@ class ExperimentTestMixin:
         )
         capture_pre = self.capsys.readouterr()  # Clear stdout
         exp.separate()
-        capture_post = self.recapsys(capture_pre)
-        self.assertTrue("Doing" in capture_post.out)
-        capture_pre = self.capsys.readouterr()  # Clear stdout
+        capture_first = self.capsys.readouterr()
         exp.separate(redo_prep=True, redo_sep=True)
-        capture_post = self.recapsys(capture_pre)
-        self.assertTrue("Doing" in capture_post.out)
+        capture_redo = self.capsys.readouterr()
+        # Re-output everything captured, once, before checking it
+        self.recapsys(capture_pre, capture_first, capture_redo)
+        self.assertTrue("Doing" in capture_first.out)
+        self.assertTrue("Doing" in capture_redo.out)
         self.compare_output(exp)
 
     def test_setattr_new(self):
@@ -846,10 +953,8 @@ class ExperimentTestMixin:
 
     def test_autoclear_images_param(self):
         """Test output attributes are cleared when image data changes."""
-        exp = core.Experiment(self.images_dir, self.roi_zip_path)
-        exp.separate()
         # Check values are set correctly
-        self.compare_output(exp)
+        exp = self.check_experiment()
         # Change images directory
         exp.images = "some/new/path/"
         # Check preparation outputs are wiped
@@ -899,10 +1004,8 @@ class ExperimentTestMixin:
 
     def test_autoclear_sep_param(self):
         """Test output attributes are cleared when sep parameters change."""
-        exp = core.Experiment(self.images_dir, self.roi_zip_path)
-        exp.separate()
         # Check values are set correctly
-        self.compare_output(exp)
+        exp = self.check_experiment()
         # Change separation parameter
         exp.method = "bespoke_method"
         # Check separation outputs are wiped
@@ -968,9 +1071,8 @@ class ExperimentTestMixin:
         """Test whether cached output is loaded during init."""
         image_path = self.images_dir
         roi_path = self.roi_zip_path
-        # Run an experiment to generate the cache
-        exp1 = core.Experiment(image_path, roi_path, self.output_dir)
-        exp1.separate()
+        # Use a cache generated by running an experiment
+        self.copy_cache()
         # Make a new experiment we will test
         exp = core.Experiment(image_path, roi_path, self.output_dir)
         # Cache should be loaded without calling separate
@@ -978,9 +1080,8 @@ class ExperimentTestMixin:
 
     def test_load_cache_redo_prep(self):
         """Test redoing preparation after loading from cache."""
-        # Run an experiment to generate the cache
-        exp1 = core.Experiment(self.images_dir, self.roi_zip_path, self.output_dir)
-        exp1.separate()
+        # Use a cache generated by running an experiment
+        self.copy_cache()
         # Make a new experiment we will test
         exp = core.Experiment(self.images_dir, self.roi_zip_path, self.output_dir)
         # Redo separation_prep
@@ -994,9 +1095,8 @@ class ExperimentTestMixin:
 
     def test_load_cache_redo_sep(self):
         """Test redo separation after loading from cache."""
-        # Run an experiment to generate the cache
-        exp1 = core.Experiment(self.images_dir, self.roi_zip_path, self.output_dir)
-        exp1.separate()
+        # Use a cache generated by running an experiment
+        self.copy_cache()
         # Make a new experiment we will test
         exp = core.Experiment(self.images_dir, self.roi_zip_path, self.output_dir)
         # Redo separation
@@ -1009,24 +1109,23 @@ class ExperimentTestMixin:
         """
         image_path = self.images_dir
         roi_path = self.roi_zip_path
-        # Run an experiment to generate the cache
-        exp1 = core.Experiment(image_path, roi_path, self.output_dir, verbosity=3)
-        exp1.separate()
-        # Make a new experiment we will test; this should load the cache
+        # Use a cache generated by running an experiment
+        self.copy_cache()
         capture_pre = self.capsys.readouterr()  # Clear stdout
+        # Make a new experiment we will test; this should load the cache
         exp = core.Experiment(image_path, roi_path, self.output_dir)
-        capture_post = self.recapsys(capture_pre)  # Capture and then re-output
-        self.assertTrue("oading data" in capture_post.out)
+        capture_init = self.capsys.readouterr()
         # Ensure previous cache is loaded again when we run separation_prep
-        capture_pre = self.capsys.readouterr()  # Clear stdout
         exp.separation_prep()
-        capture_post = self.recapsys(capture_pre)
-        self.assertTrue("oading data" in capture_post.out)
+        capture_prep = self.capsys.readouterr()
         # Ensure previous cache is loaded again when we run separate
-        capture_pre = self.capsys.readouterr()  # Clear stdout
         exp.separate()
-        capture_post = self.recapsys(capture_pre)
-        self.assertTrue("oading data" in capture_post.out)
+        capture_sep = self.capsys.readouterr()
+        # Re-output everything captured, once, before checking it
+        self.recapsys(capture_pre, capture_init, capture_prep, capture_sep)
+        self.assertTrue("oading data" in capture_init.out)
+        self.assertTrue("oading data" in capture_prep.out)
+        self.assertTrue("oading data" in capture_sep.out)
         # Check the contents loaded from cache
         self.compare_output(exp)
 
@@ -1036,26 +1135,25 @@ class ExperimentTestMixin:
         """
         image_path = self.images_dir
         roi_path = self.roi_zip_path
-        # Run an experiment to generate the cache
-        exp1 = core.Experiment(image_path, roi_path, self.output_dir)
-        exp1.separation_prep()
-        # Make a new experiment we will test; this should load the cache
+        # Use a cache of only the preparation results
+        self.copy_cache(separated=False)
         capture_pre = self.capsys.readouterr()  # Clear stdout
+        # Make a new experiment we will test; this should load the cache
         exp = core.Experiment(image_path, roi_path, self.output_dir, verbosity=3)
-        capture_post = self.recapsys(capture_pre)  # Capture and then re-output
-        self.assertTrue("oading data" in capture_post.out)
+        capture_init = self.capsys.readouterr()
         # Ensure previous cache is loaded again when we run separation_prep
-        capture_pre = self.capsys.readouterr()  # Clear stdout
         exp.separation_prep()
-        capture_post = self.recapsys(capture_pre)  # Capture and then re-output
-        self.assertTrue("oading data" in capture_post.out)
+        capture_prep = self.capsys.readouterr()
         # Check separation outputs are not set
         self.assertIs(exp.result, None)
         # Since we did not run and cache separate, this needs to run now
-        capture_pre = self.capsys.readouterr()  # Clear stdout
         exp.separate()
-        capture_post = self.recapsys(capture_pre)
-        self.assert_starts_with(capture_post.out, "Doing signal separation")
+        capture_sep = self.capsys.readouterr()
+        # Re-output everything captured, once, before checking it
+        self.recapsys(capture_pre, capture_init, capture_prep, capture_sep)
+        self.assertTrue("oading data" in capture_init.out)
+        self.assertTrue("oading data" in capture_prep.out)
+        self.assert_starts_with(capture_sep.out, "Doing signal separation")
         # Check the contents loaded from cache
         self.compare_output(exp)
 
@@ -1580,11 +1678,7 @@ class ExperimentTestMixin:
         """
         image_path = self.images_dir
         roi_path = self.roi_zip_path
-        if not os.path.exists(self.output_dir):
-            os.makedirs(self.output_dir)
-        # Make a bad cache
-        with open(os.path.join(self.output_dir, "prepared.npz"), "w") as f:
-            f.write("badfilecontents")
+        self.write_bad_cache("prepared.npz")
 
         capture_pre = self.capsys.readouterr()  # Clear stdout
         exp = core.Experiment(image_path, roi_path, self.output_dir)
@@ -1600,11 +1694,7 @@ class ExperimentTestMixin:
         """
         image_path = self.images_dir
         roi_path = self.roi_zip_path
-        if not os.path.exists(self.output_dir):
-            os.makedirs(self.output_dir)
-        # Make a bad cache
-        with open(os.path.join(self.output_dir, "prepared.npz"), "w") as f:
-            f.write("badfilecontents")
+        self.write_bad_cache("prepared.npz")
 
         capture_pre = self.capsys.readouterr()  # Clear stdout
         exp = core.Experiment(image_path, roi_path, self.output_dir)
@@ -1625,9 +1715,7 @@ class ExperimentTestMixin:
         if not os.path.exists(self.output_dir):
             os.makedirs(self.output_dir)
         exp = core.Experiment(image_path, roi_path, self.output_dir, verbosity=3)
-        # Make a bad cache
-        with open(os.path.join(self.output_dir, "prepared.npz"), "w") as f:
-            f.write("badfilecontents")
+        self.write_bad_cache("prepared.npz")
 
         capture_pre = self.capsys.readouterr()  # Clear stdout
         exp.separation_prep()
@@ -1651,9 +1739,7 @@ class ExperimentTestMixin:
             os.makedirs(self.output_dir)
         exp = core.Experiment(image_path, roi_path, self.output_dir)
         exp.separation_prep()
-        # Make a bad cache
-        with open(os.path.join(self.output_dir, "separated.npz"), "w") as f:
-            f.write("badfilecontents")
+        self.write_bad_cache("separated.npz")
 
         capture_pre = self.capsys.readouterr()  # Clear stdout
         exp.separate()
@@ -1701,14 +1787,12 @@ class ExperimentTestMixin:
             exp.load()
 
     def test_calcdeltaf(self):
-        exp = core.Experiment(self.images_dir, self.roi_zip_path)
-        exp.separate()
+        exp = self.load_separated()
         exp.calc_deltaf(self.fs)
         self.compare_output(exp, compare_deltaf=True)
 
     def test_calcdeltaf_quiet(self):
-        exp = core.Experiment(self.images_dir, self.roi_zip_path, verbosity=0)
-        exp.separate()
+        exp = self.load_separated(verbosity=0)
         capture_pre = self.capsys.readouterr()  # Clear stdout
         with warnings.catch_warnings():
             warnings.simplefilter("ignore")
@@ -1718,8 +1802,7 @@ class ExperimentTestMixin:
         self.compare_output(exp, compare_deltaf=True)
 
     def test_calcdeltaf_verbosity2(self):
-        exp = core.Experiment(self.images_dir, self.roi_zip_path, verbosity=2)
-        exp.separate()
+        exp = self.load_separated(verbosity=2)
         capture_pre = self.capsys.readouterr()  # Clear stdout
         with warnings.catch_warnings():
             warnings.simplefilter("ignore")
@@ -1729,8 +1812,7 @@ class ExperimentTestMixin:
         self.compare_output(exp, compare_deltaf=True)
 
     def test_calcdeltaf_verbosity4(self):
-        exp = core.Experiment(self.images_dir, self.roi_zip_path, verbosity=4)
-        exp.separate()
+        exp = self.load_separated(verbosity=4)
         capture_pre = self.capsys.readouterr()  # Clear stdout
         with warnings.catch_warnings():
             warnings.simplefilter("ignore")
@@ -1747,8 +1829,7 @@ class ExperimentTestMixin:
         self.compare_output(exp, compare_deltaf=True)
 
     def test_calcdeltaf_notrawf0(self):
-        exp = core.Experiment(self.images_dir, self.roi_zip_path, verbosity=4)
-        exp.separate()
+        exp = self.load_separated(verbosity=4)
         # Ignore division by zero, which is likely to occur now and something
         # we want to alert the user to.
         with warnings.catch_warnings():
@@ -1765,8 +1846,7 @@ class ExperimentTestMixin:
         self.assert_equal(np.shape(exp.deltaf_result), expected_shape)
 
     def test_calcdeltaf_notacrosstrials(self):
-        exp = core.Experiment(self.images_dir, self.roi_zip_path, verbosity=4)
-        exp.separate()
+        exp = self.load_separated(verbosity=4)
         exp.calc_deltaf(self.fs, across_trials=False)
         # We did not use this setting to generate the expected values, so can't
         # compare the output against the target.
@@ -1776,8 +1856,7 @@ class ExperimentTestMixin:
         self.assert_equal(np.shape(exp.deltaf_result), expected_shape)
 
     def test_calcdeltaf_notrawf0_notacrosstrials(self):
-        exp = core.Experiment(self.images_dir, self.roi_zip_path, verbosity=4)
-        exp.separate()
+        exp = self.load_separated(verbosity=4)
         # Ignore division by zero, which is likely to occur now and something
         # we want to alert the user to.
         with warnings.catch_warnings():
@@ -1826,9 +1905,8 @@ class ExperimentTestMixin:
 
     def test_matlab_from_cache(self):
         """Save to matfile after loading from cache."""
-        # Run an experiment to generate the cache
-        exp1 = core.Experiment(self.images_dir, self.roi_zip_path, self.output_dir)
-        exp1.separate()
+        # Use a cache generated by running an experiment
+        self.copy_cache()
         # Make a new experiment we will test
         exp = core.Experiment(self.images_dir, self.roi_zip_path, self.output_dir)
         # Cache should be loaded without calling separate
@@ -1890,9 +1968,8 @@ class ExperimentTestMixin:
 
     def test_matlab_legacy_from_cache(self):
         """Save to matfile after loading from cache."""
-        # Run an experiment to generate the cache
-        exp1 = core.Experiment(self.images_dir, self.roi_zip_path, self.output_dir)
-        exp1.separate()
+        # Use a cache generated by running an experiment
+        self.copy_cache()
         # Make a new experiment we will test
         exp = core.Experiment(self.images_dir, self.roi_zip_path, self.output_dir)
         # Cache should be loaded without calling separate
@@ -1980,53 +2057,40 @@ class ExperimentTestMixin:
 class TestExperimentB(BaseTestCase, ExperimentTestMixin):
     """Test core on Experiment B, which has 2 ROIs and 3 TIFFs."""
 
-    def __init__(self, *args, **kwargs):
-        super(TestExperimentB, self).__init__(*args, **kwargs)
-        ExperimentTestMixin.__init__(self)
-
-        self.resources_dir = os.path.join(self.test_directory, "resources", "b")
-        self.images_dir = os.path.join(self.resources_dir, "images")
-        self.image_names = ["AVG_A01.tif", "AVG_A02.tif", "AVG_A03.tif"]
-        self.image_shape = (29, 21)
-        self.fs = 1
-        self.roi_zip_path = os.path.join(self.resources_dir, "rois.zip")
-        self.roi_paths = [os.path.join("rois", "{:02d}.roi") for r in range(3, 5)]
-
-        self.expected = np.load(
-            os.path.join(
-                self.resources_dir,
-                "expected_py{}.npz".format(sys.version_info.major),
-            ),
-            allow_pickle=True,
-        )
+    @classmethod
+    def setUpClass(cls):
+        super(TestExperimentB, cls).setUpClass()
+
+        cls.resources_dir = os.path.join(cls.test_directory, "resources", "b")
+        cls.images_dir = os.path.join(cls.resources_dir, "images")
+        cls.image_names = ["AVG_A01.tif", "AVG_A02.tif", "AVG_A03.tif"]
+        cls.image_shape = (29, 21)
+        cls.fs = 1
+        cls.roi_zip_path = os.path.join(cls.resources_dir, "rois.zip")
+        cls.roi_paths = [os.path.join("rois", "{:02d}.roi") for r in range(3, 5)]
 
 
 class TestExtract(BaseTestCase):
     """Tests for the extract helper function."""
 
-    def __init__(self, *args, **kwargs):
-        super(TestExtract, self).__init__(*args, **kwargs)
+    @classmethod
+    def setUpClass(cls):
+        super(TestExtract, cls).setUpClass()
 
         # Load cached data
-        self.resources_dir = os.path.join(self.test_directory, "resources", "b")
-        self.images_dir = os.path.join(self.resources_dir, "images")
-        self.image_name = "AVG_A01.tif"
-        self.image_path = os.path.join(self.images_dir, self.image_name)
-        self.image_shape = (29, 21)
-        self.roi_zip_path = os.path.join(self.resources_dir, "rois.zip")
-        self.roi_paths = [os.path.join("rois", "{:02d}.roi") for r in range(3, 5)]
-
-        cache = np.load(
-            os.path.join(
-                self.resources_dir,
-                "expected_py{}.npz".format(sys.version_info.major),
-            ),
-            allow_pickle=True,
-        )
+        cls.resources_dir = os.path.join(cls.test_directory, "resources", "b")
+        cls.images_dir = os.path.join(cls.resources_dir, "images")
+        cls.image_name = "AVG_A01.tif"
+        cls.image_path = os.path.join(cls.images_dir, cls.image_name)
+        cls.image_shape = (29, 21)
+        cls.roi_zip_path = os.path.join(cls.resources_dir, "rois.zip")
+        cls.roi_paths = [os.path.join("rois", "{:02d}.roi") for r in range(3, 5)]
+
+        cache = load_expected(cls.resources_dir)
         # Test against saved data for the first image only
-        self.expected_raw = np.stack(cache["raw"][:, 0], axis=0)
-        self.expected_roi_polys = list(cache["roi_polys"][:, 0])
-        self.expected_mean = cache["means"][0]
+        cls.expected_raw = np.stack(cache["raw"][:, 0], axis=0)
+        cls.expected_roi_polys = list(cache["roi_polys"][:, 0])
+        cls.expected_mean = cache["means"][0]
 
     def compare_outputs(self, outputs):
         data, roi_polys, mean = outputs
@@ -2039,6 +2103,40 @@ class TestExtract(BaseTestCase):
         outputs = core.extract(self.image_path, self.roi_zip_path)
         self.compare_outputs(outputs)
 
+    def test_datahandler_subclass_extracttraces(self):
+        """Test an overridden extracttraces is given the masks for each ROI."""
+
+        class CustomHandler(extraction.DataHandlerTifffile):
+            @staticmethod
+            def extracttraces(data, masks):
+                assert isinstance(masks, list)
+                # The ROI and its 4 default neuropil regions
+                assert len(masks) == 5
+                # Slicing must work on the masks, as for rois2masks outputs
+                assert len(masks[:1]) == 1
+                return np.full((len(masks), data.shape[0]), 999.0)
+
+        traces, roi_polys, mean = core.extract(
+            self.image_path, self.roi_zip_path, datahandler=CustomHandler()
+        )
+        self.assert_equal(traces, np.full(self.expected_raw.shape, 999.0))
+        self.assert_allclose_ragged(roi_polys, self.expected_roi_polys)
+        self.assert_equal(mean, self.expected_mean)
+
+    def test_datahandler_subclass_getmean(self):
+        """Test an overridden getmean is used."""
+
+        class CustomHandler(extraction.DataHandlerTifffile):
+            @staticmethod
+            def getmean(data):
+                return np.full(data.shape[1:], 999.0)
+
+        traces, roi_polys, mean = core.extract(
+            self.image_path, self.roi_zip_path, datahandler=CustomHandler()
+        )
+        self.assert_allclose(traces, self.expected_raw)
+        self.assert_equal(mean, np.full(self.expected_mean.shape, 999.0))
+
     def test_separate_trials_label_int(self):
         label = 239457
         capture_pre = self.capsys.readouterr()  # Clear stdout
@@ -2059,27 +2157,22 @@ class TestExtract(BaseTestCase):
 class TestSeparateTrials(BaseTestCase):
     """Tests for the separate_trials helper function."""
 
-    def __init__(self, *args, **kwargs):
-        super(TestSeparateTrials, self).__init__(*args, **kwargs)
+    @classmethod
+    def setUpClass(cls):
+        super(TestSeparateTrials, cls).setUpClass()
 
         # Load cached data
-        self.resources_dir = os.path.join(self.test_directory, "resources", "b")
-        cache = np.load(
-            os.path.join(
-                self.resources_dir,
-                "expected_py{}.npz".format(sys.version_info.major),
-            ),
-            allow_pickle=True,
-        )
+        cls.resources_dir = os.path.join(cls.test_directory, "resources", "b")
+        cache = load_expected(cls.resources_dir)
         # Test against saved data for the first ROI
-        self.raw = cache["raw"][0]
-        self.expected_sep = list(cache["sep"][0])
-        self.expected_match = list(cache["result"][0])
-        self.expected_mixmat = cache["mixmat"][0][0]
-        self.expected_convergence = cache["info"][0][0]
+        cls.raw = cache["raw"][0]
+        cls.expected_sep = list(cache["sep"][0])
+        cls.expected_match = list(cache["result"][0])
+        cls.expected_mixmat = cache["mixmat"][0][0]
+        cls.expected_convergence = dict(cache["info"][0][0])
         # We can't require the number of iterations to be the same across
         # all versions of sklearn.
-        self.expected_convergence.pop("iterations")
+        cls.expected_convergence.pop("iterations")
 
     def compare_outputs(self, outputs):
         Xsep, Xmatch, Xmixmat, convergence = outputs
@@ -6,9 +6,7 @@ from __future__ import division
 
 import functools
 import os
-import shutil
 import sys
-import tempfile
 
 import numpy as np
 import pytest
@@ -165,6 +163,49 @@ def test_multiframe_image2array(base_fname, dtype, datahandler):
         return fn()
 
 
+def _is_memmapped(array):
+    """Check whether an array is backed by a :class:`numpy.memmap`."""
+    while array is not None:
+        if isinstance(array, np.memmap):
+            return True
+        array = getattr(array, "base", None)
+    return False
+
+
+@pytest.mark.parametrize("dtype", ["uint8", "uint16", "int16", "float32"])
+def test_multiframe_image2array_compressed(dtype, tmp_path):
+    """
+    Test loading compressed TIFFs, which are read instead of memory-mapped.
+    """
+    fname = os.path.join(RESOURCES_DIR, "tifffile.imsave_{}.tif".format(dtype))
+    expected = extraction.DataHandlerTifffile.image2array(fname)
+    compressed_fname = str(tmp_path / "compressed_{}.tif".format(dtype))
+    try:
+        tifffile.imwrite(compressed_fname, expected, compression="zlib")
+    except TypeError:
+        # Older versions of tifffile take the compression level instead
+        tifffile.imwrite(compressed_fname, expected, compress=6)
+    actual = extraction.DataHandlerTifffile.image2array(compressed_fname)
+    assert not _is_memmapped(actual)
+    base_test.assert_equal(actual, expected)
+
+
+@pytest.mark.parametrize("dtype", ["uint16", "int16", "float32"])
+def test_image2array_big_endian(dtype, tmp_path):
+    """
+    Test big-endian TIFFs are loaded with a native byte order.
+    """
+    fname = os.path.join(RESOURCES_DIR, "tifffile.imsave_{}.tif".format(dtype))
+    # Use a single frame, which is stored as one contiguous page
+    expected = extraction.DataHandlerTifffile.image2array(fname)[:1]
+    big_endian_fname = str(tmp_path / "big_endian_{}.tif".format(dtype))
+    tifffile.imwrite(big_endian_fname, expected[0], byteorder=">")
+    actual = extraction.DataHandlerTifffile.image2array(big_endian_fname)
+    assert actual.dtype.isnative
+    assert actual.dtype == np.dtype(dtype)
+    base_test.assert_equal(actual, expected)
+
+
 @pytest.mark.parametrize("dtype", ["uint8", "uint16", "float32"])
 @pytest.mark.parametrize("datahandler", [extraction.DataHandlerTifffile])
 def test_multiframe_image2array_imagejformat(dtype, datahandler):
@@ -420,6 +461,156 @@ def test_multiframe_mean_higherdim_pillow(base_fname, shp, dtype, datahandler):
     )
 
 
+def check_multiframe_extracttraces(base_fname, dtype, datahandler):
+    """
+    Check the traces extracted from a multiframe TIFF are correct.
+
+    Helper function called by tests.
+
+    Parameters
+    ----------
+    base_fname : str
+        Base file name, for example ``"tifffile.imsave.bigtiff"``.
+    dtype : str
+        String representation of a data type, e.g. ``"uint8"``.
+    datahandler : extraction.DataHandlerAbstract
+        An object bearing ``image2array``, ``extracttraces`` and
+        ``extract_and_mean`` methods. The traces returned must match
+        the average within each mask for every frame of the TIFF file.
+    """
+    expected = np.array(
+        [
+            [[-11, 12], [14, 15], [17, 18]],
+            [[21, 22], [24, 25], [27, 28]],
+            [[31, 32], [34, 35], [37, 38]],
+            [[41, 42], [44, 45], [47, 48]],
+            [[51, 52], [54, 55], [57, 58]],
+            [[61, 62], [64, 55], [67, 68]],
+        ]
+    )
+    expected = get_dtyped_expected(expected, dtype)
+    masks = [
+        np.array([[True, False], [False, False], [False, False]]),
+        np.array([[False, True], [True, False], [False, True]]),
+        np.array([[True, True], [True, True], [True, True]]),
+    ]
+    expected_mean = np.mean(expected, dtype=np.float64, axis=0)
+    expected = np.stack(
+        [np.mean(expected[:, mask], dtype=np.float64, axis=1) for mask in masks]
+    )
+    fname = os.path.join(RESOURCES_DIR, base_fname + "_{}.tif".format(dtype))
+    data = datahandler.image2array(fname)
+    actual = datahandler.extracttraces(data, masks)
+    base_test.assert_allclose(actual, expected)
+    # Check the mean and traces are the same when found together
+    actual_mean, actual = datahandler.extract_and_mean(data, masks)
+    base_test.assert_allclose(actual_mean, expected_mean)
+    base_test.assert_allclose(actual, expected)
+
+
+@pytest.mark.parametrize(
+    "dtype",
+    ["uint8", "uint16", "uint64", "int16", "int64", "float16", "float32", "float64"],
+)
+@pytest.mark.parametrize(
+    "datahandler", [extraction.DataHandlerTifffile, extraction.DataHandlerTifffileLazy]
+)
+def test_multiframe_extracttraces(dtype, datahandler):
+    """
+    Test the traces extracted from TIFFs.
+    """
+    return check_multiframe_extracttraces(
+        base_fname="tifffile.imsave", dtype=dtype, datahandler=datahandler
+    )
+
+
+@pytest.mark.parametrize("dtype", ["uint8", "uint16", "int16", "float32"])
+@pytest.mark.parametrize("datahandler", [extraction.DataHandlerPillow])
+def test_multiframe_extracttraces_pillow(dtype, datahandler):
+    """
+    Test the traces extracted from TIFFs with :class:`~extraction.DataHandlerPillow`.
+    """
+    return check_multiframe_extracttraces(
+        base_fname="tifffile.imsave", dtype=dtype, datahandler=datahandler
+    )
+
+
+@pytest.mark.parametrize(
+    "datahandler",
+    [
+        extraction.DataHandlerTifffile,
+        extraction.DataHandlerTifffileLazy,
+        extraction.DataHandlerPillow,
+    ],
+)
+def test_extracttraces_empty_mask(datahandler):
+    """
+    Test the trace extracted from an empty mask is NaN.
+    """
+    masks = [
+        np.array([[True, False], [False, False], [False, False]]),
+        np.zeros((3, 2), dtype=bool),
+    ]
+    fname = os.path.join(RESOURCES_DIR, "tifffile.imsave_float32.tif")
+    data = datahandler.image2array(fname)
+    for actual in (
+        datahandler.extracttraces(data, masks),
+        datahandler.extract_and_mean(data, masks)[1],
+    ):
+        assert np.all(np.isfinite(actual[0]))
+        assert np.all(np.isnan(actual[1]))
+
+
+@pytest.mark.parametrize("n_jobs", [1, 2])
+@pytest.mark.parametrize("from_file_object", [False, True])
+def test_extracttraces_pillow_n_jobs(n_jobs, from_file_object):
+    """
+    Test :class:`~extraction.DataHandlerPillow` traces with several threads.
+
+    Images opened from a file object are always decoded serially.
+    """
+    masks = [
+        np.array([[True, False], [False, False], [False, False]]),
+        np.array([[False, True], [True, False], [False, True]]),
+    ]
+    fname = os.path.join(RESOURCES_DIR, "tifffile.imsave_uint16.tif")
+    expected = extraction.DataHandlerTifffile.extracttraces(
+        extraction.DataHandlerTifffile.image2array(fname), masks
+    )
+    with open(fname, "rb") as f:
+        image = f if from_file_object else fname
+        data = extraction.DataHandlerPillow.image2array(image)
+        actual = extraction.DataHandlerPillow.extracttraces(data, masks, n_jobs=n_jobs)
+    base_test.assert_allclose(actual, expected)
+
+
+@pytest.mark.parametrize("method", ["sparse", "kernel", "compiled"])
+def test_extract_flat(method, monkeypatch):
+    """
+    Test each way of extracting traces from flattened data gives the same result.
+    """
+    rng = np.random.RandomState(0)
+    data = rng.rand(7, 30)
+    dense_masks = [rng.rand(5, 6) > 0.5 for _ in range(4)]
+    dense_masks.append(np.zeros((5, 6), dtype=bool))
+    masks = roitools.MaskSet.from_masks(dense_masks)
+    expected = np.array(
+        [data[:, mask.ravel()].mean(axis=1) for mask in dense_masks[:-1]]
+        + [np.full(data.shape[0], np.nan)]
+    )
+    if method == "sparse":
+        monkeypatch.setattr(extraction, "numba", None)
+    elif method == "kernel":
+        # Run the kernel as plain python code, which works without numba
+        kernel = getattr(extraction._extract_csr, "py_func", extraction._extract_csr)
+        monkeypatch.setattr(extraction, "_extract_csr", kernel)
+        monkeypatch.setattr(extraction, "numba", extraction.numba or True)
+    elif extraction.numba is None:
+        pytest.skip("numba is not installed")
+    actual = extraction._extract_flat(data, masks)
+    base_test.assert_allclose(actual, expected)
+
+
 class TestDataHandlerRepr(BaseTestCase):
     """String representations of DataHandler are correct."""
 
@@ -524,9 +715,12 @@ class TestRois2MasksTifffile(BaseTestCase, Rois2MasksTestMixin):
 class TestRois2MasksTifffileLazy(BaseTestCase, Rois2MasksTestMixin):
     """Tests for rois2masks using `~extraction.DataHandlerTifffileLazy`."""
 
+    @pytest.fixture(autouse=True)
+    def tempdir(self, tmp_path):
+        self.tempdir = str(tmp_path)
+
     def setUp(self):
         Rois2MasksTestMixin.setUp(self)
-        os.makedirs(self.tempdir)
         self.filename = os.path.join(self.tempdir, "tmp.tif")
         tifffile.imsave(self.filename, self.data)
         self.data = tifffile.TiffFile(self.filename)
@@ -534,8 +728,6 @@ class TestRois2MasksTifffileLazy(BaseTestCase, Rois2MasksTestMixin):
 
     def tearDown(self):
         self.data.close()
-        if os.path.isdir(self.tempdir):
-            shutil.rmtree(self.tempdir)
 
 
 class TestRois2MasksPillow(BaseTestCase, Rois2MasksTestMixin):
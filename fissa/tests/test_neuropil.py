@@ -7,6 +7,7 @@ Created: 2015-11-06
 import warnings
 
 import numpy as np
+import sklearn.decomposition
 
 from .. import neuropil as npil
 from .base_test import BaseTestCase
@@ -111,6 +112,40 @@ class TestNeuropilICA(BaseTestCase, NeuropilMixin):
         NeuropilMixin.setUp(self)
         self.method = "ica"
 
+    def test_full_rank_many_signals(self):
+        # Separate as many components as there are signals, from a mixture
+        # of as many sources
+        x = self.x
+        sources = np.array(
+            [np.sin(x), np.cos(3 * x), np.sin(5 * x + 1), np.cos(2 * x + 2)]
+        )
+        W = np.array(
+            [
+                [0.7, 0.1, 0.1, 0.1],
+                [0.2, 0.5, 0.2, 0.1],
+                [0.1, 0.2, 0.6, 0.1],
+                [0.1, 0.3, 0.1, 0.5],
+            ]
+        )
+        S = np.dot(W, sources + 1)
+        S_sep, S_matched, A_sep, convergence = npil.separate(
+            S.copy(), sep_method=self.method, n=4, max_tries=1, verbosity=0
+        )
+        self.assert_equal(S_sep.shape, S.shape)
+        self.assert_equal(A_sep.shape, (4, 4))
+        self.assert_equal(convergence["converged"], True)
+        # With the number of components given, the result is the same as
+        # running FastICA directly on the normalized signals
+        estimator = sklearn.decomposition.FastICA(
+            n_components=4,
+            whiten=npil._FASTICA_WHITEN,
+            max_iter=10000,
+            tol=1e-4,
+            random_state=892,
+        )
+        self.assert_allclose(S_sep.T, estimator.fit_transform((S / np.median(S)).T))
+        self.assert_allclose(A_sep, estimator.mixing_)
+
 
 class TestNeuropilFA(BaseTestCase, NeuropilMixin):
     def setUp(self):
@@ -322,3 +322,44 @@ class TestGetNpilMask(BaseTestCase):
         for area in [5, 6, 7, 8]:
             actual = roitools.get_npil_mask(mask, area)
             self.assert_equal(actual, desired)
+
+
+class TestMaskSet(BaseTestCase):
+    """Tests for MaskSet."""
+
+    def test_roundtrip(self):
+        masks = [
+            np.array([[True, False, False], [False, False, True]]),
+            np.array([[False, False, False], [False, False, False]]),
+            np.array([[True, True, True], [True, True, True]]),
+        ]
+        maskset = roitools.MaskSet.from_masks(masks)
+        self.assertEqual(len(maskset), 3)
+        self.assertEqual(maskset.shape, (2, 3))
+        self.assert_equal(maskset.sizes, [2, 0, 6])
+        self.assert_equal(maskset.indices, [0, 5, 0, 1, 2, 3, 4, 5])
+        self.assert_allclose(maskset.weights, [0.5] * 2 + [1 / 6] * 6)
+        for i, mask in enumerate(masks):
+            self.assert_equal(maskset[i], mask)
+        self.assert_equal(maskset[-1], masks[-1])
+        with self.assertRaises(IndexError):
+            maskset[3]
+        self.assert_equal(maskset[:2], masks[:2])
+        self.assert_equal(maskset[::-1], masks[::-1])
+
+    def test_from_maskset(self):
+        maskset = roitools.MaskSet.from_masks([np.eye(3, dtype=bool)])
+        self.assertIs(roitools.MaskSet.from_masks(maskset), maskset)
+
+    def test_concatenate(self):
+        masks = [np.eye(3, dtype=bool), np.ones((3, 3), dtype=bool)]
+        masks += [np.zeros((3, 3), dtype=bool), np.tri(3, dtype=bool)]
+        maskset = roitools.MaskSet.concatenate(
+            [
+                roitools.MaskSet.from_masks(masks[:1]),
+                roitools.MaskSet.from_masks(masks[1:]),
+            ]
+        )
+        self.assertEqual(len(maskset), len(masks))
+        for i, mask in enumerate(masks):
+            self.assert_equal(maskset[i], mask)
@@ -20,6 +20,9 @@ install_requires = read("requirements.txt").splitlines()
 
 extras_require = {}
 
+# Optional dependency to speed up trace extraction
+extras_require["numba"] = read("requirements-numba.txt").splitlines()
+
 # Notebook dependencies for plotting
 extras_require["plotting"] = read("requirements-plots.txt").splitlines()
 